@@ -1,12 +1,21 @@
+import os
 from dash import Dash
 from layout import serve_layout
 from callbacks import register_callbacks
+from export_utils import start_pool
+from gpx_utils import laad_route
 
-app = Dash(__name__, suppress_callback_exceptions=True)
+# compress=True zet gzip/brotli aan via flask-compress (pip install flask-compress brotli)
+app = Dash(__name__, suppress_callback_exceptions=True, compress=True)
 app.title = "Eurotrip Etappeplanner"
 app.layout = serve_layout  # Of gebruik: app.layout = serve_layout()
 
 register_callbacks(app)
 
 if __name__ == "__main__":
+    # Met debug=True draait dit blok ook in het proces dat enkel de reloader bewaakt;
+    # de route en de export-pool zijn alleen nodig in het proces dat de server draait
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        laad_route()  # Route al inlezen voor de eerste request
+        start_pool()  # Workers forken nu, voordat de server threads start
     app.run(debug=True)
@@ -0,0 +1,129 @@
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from data_utils import list_csv_files, load_data_from_csv, save_data_to_csv
+from etappe_utils import calc_etappes
+from gpx_utils import laad_route
+
+# Onder dit aantal bestanden is een pool opstarten duurder dan het werk zelf
+MIN_BESTANDEN_VOOR_POOL = 8
+
+# Route per proces, gezet door zet_route; de route wordt enkel in het hoofdproces
+# ingelezen en via de initializer aan de workers meegegeven (spawn/forkserver)
+route_x = None
+route_y = None
+
+
+def zet_route(x, y):
+    global route_x, route_y
+    route_x, route_y = x, y
+
+
+def herbereken_bestand(filename, controleer_enkel=False):
+    start = time.perf_counter()
+    team_data, tempo_data, opmerking_data, grenzen = load_data_from_csv(filename)
+
+    einde = route_x[-1]
+    ongeldig = [g for g in grenzen if g < 0 or g > einde]
+
+    resultaten = calc_etappes(route_x, route_y, grenzen)
+    # Een plan met grenzen buiten de route niet wegschrijven: de etappes voorbij
+    # het einde vallen dan weg, samen met hun Teamlid, Tempo en Opmerking
+    bewaard = not controleer_enkel and not ongeldig
+    if bewaard:
+        save_data_to_csv(resultaten, team_data, tempo_data, opmerking_data, grenzen, filename)
+
+    return {
+        "bestand": filename,
+        "etappes": len(resultaten),
+        "ongeldig": ongeldig,
+        "bewaard": bewaard,
+        "duur": time.perf_counter() - start
+    }
+
+
+def aantal_workers(waarde):
+    aantal = int(waarde)
+    if aantal < 1:
+        raise argparse.ArgumentTypeError("moet minstens 1 zijn")
+    return aantal
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Herbereken Afstand/Stijging/Daling voor alle plannen in data/ zonder de Dash-server."
+    )
+    parser.add_argument("bestanden", nargs="*", help="CSV-bestanden in data/ (standaard: allemaal)")
+    parser.add_argument("-j", "--workers", type=aantal_workers, default=None, help="Aantal processen (standaard: aantal CPU's)")
+    parser.add_argument("--controleer", action="store_true", help="Enkel controleren, niets wegschrijven")
+    args = parser.parse_args()
+
+    beschikbaar = list_csv_files()
+    onbekend = [b for b in args.bestanden if b not in beschikbaar]
+    if onbekend:
+        parser.error(f"niet gevonden in data/: {', '.join(onbekend)}")
+
+    bestanden = args.bestanden or beschikbaar
+    if not bestanden:
+        print("Geen CSV-bestanden gevonden in data/")
+        return 0
+
+    start = time.perf_counter()
+    x_data, y_data, lat_data, lon_data = laad_route()  # Route één keer inlezen, in dit proces
+    inlezen = time.perf_counter() - start
+
+    resultaten = {}
+    fouten = {}
+    if len(bestanden) < MIN_BESTANDEN_VOOR_POOL or args.workers == 1:
+        zet_route(x_data, y_data)
+        for b in bestanden:
+            try:
+                resultaten[b] = herbereken_bestand(b, args.controleer)
+            except Exception as e:
+                fouten[b] = e
+    else:
+        with ProcessPoolExecutor(
+            max_workers=args.workers, initializer=zet_route, initargs=(x_data, y_data)
+        ) as pool:
+            taken = {pool.submit(herbereken_bestand, b, args.controleer): b for b in bestanden}
+            for taak in as_completed(taken):
+                try:
+                    resultaten[taken[taak]] = taak.result()
+                except Exception as e:
+                    fouten[taken[taak]] = e
+    totaal = time.perf_counter() - start
+
+    aantal_ongeldig = 0
+    for b in bestanden:
+        if b in fouten:
+            fout = fouten[b]
+            print(f"{b:<40} FOUT: {type(fout).__name__}" + (f": {fout}" if str(fout) else " (leeg of onleesbaar bestand?)"))
+            continue
+        r = resultaten[b]
+        print(f"{r['bestand']:<40} {r['etappes']:>3} etappes  {r['duur'] * 1000:7.1f} ms")
+        for g in r["ongeldig"]:
+            aantal_ongeldig += 1
+            print(f"    ! grens op {g} km ligt buiten de route (0 - {x_data[-1]:.2f} km)")
+        if not r["bewaard"] and not args.controleer:
+            print("    ! niet weggeschreven, pas eerst de grenzen aan")
+
+    if args.controleer:
+        samenvatting = f"{len(resultaten)} bestanden gecontroleerd"
+    else:
+        samenvatting = f"{sum(r['bewaard'] for r in resultaten.values())} bestanden herberekend"
+    print(f"\n{samenvatting} in {totaal:.2f} s "
+          f"(route inlezen {inlezen:.2f} s, "
+          f"{sum(r['duur'] for r in resultaten.values()):.2f} s rekentijd over alle processen)")
+    overgeslagen = [r for r in resultaten.values() if not r["bewaard"]]
+    if overgeslagen and not args.controleer:
+        print(f"{len(overgeslagen)} bestand(en) niet weggeschreven wegens grenzen buiten de route")
+    if aantal_ongeldig:
+        print(f"{aantal_ongeldig} grens(en) buiten de route gevonden")
+    if fouten:
+        print(f"{len(fouten)} bestand(en) konden niet verwerkt worden")
+    return 1 if aantal_ongeldig or fouten else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
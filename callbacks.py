@@ -2,10 +2,57 @@ import dash
 from dash import dcc, html, Output, Input, State, ctx
 import plotly.graph_objs as go
 import re
+from functools import lru_cache
 import numpy as np
 import pandas as pd
 from data_utils import list_csv_files, load_data_from_csv, save_data_to_csv
-from gpx_utils import x_data, y_data, lat_data, lon_data, segmenteer_route, calc_etappes, tempo_str_to_min, team_kleuren, teamleden
+from export_utils import exporteer_zip
+from gpx_utils import laad_route, segmenteer_route, calc_etappes, tempo_str_to_min, team_kleuren, teamleden
+
+# Afgeronde waarden die als gewone JSON-getallen naar de browser gaan. Na gzip/brotli
+# is dat kleiner dan base64 typed arrays van dezelfde waarden (gemeten).
+# Het opknippen gebeurt wel op de volle precisie in x_arr.
+@lru_cache(maxsize=None)
+def plot_route():
+    x_data, y_data, lat_data, lon_data = laad_route()
+    x_arr = np.array(x_data)
+    x_plot = np.round(x_arr, 2)                            # 10 m
+    y_plot = np.round(np.array(y_data)).astype(int)        # 1 m
+    lat_plot = np.round(np.array(lat_data), 5)             # ~1 m
+    lon_plot = np.round(np.array(lon_data), 5)
+    return x_arr, x_plot, y_plot, lat_plot, lon_plot
+
+# Klein template i.p.v. het standaard plotly-template (~7 KB bij elke figuur), zelfde look
+MINI_TEMPLATE = go.layout.Template(layout=dict(
+    font=dict(color="#2a3f5f"),
+    paper_bgcolor="white",
+    plot_bgcolor="#E5ECF6",
+    hovermode="closest",
+    title=dict(x=0.05),
+    xaxis=dict(gridcolor="white", linecolor="white", zerolinecolor="white", zerolinewidth=2, automargin=True),
+    yaxis=dict(gridcolor="white", linecolor="white", zerolinecolor="white", zerolinewidth=2, automargin=True)
+))
+
+def etappe_grenzen(grenzen):
+    x_data = laad_route()[0]
+    return [0] + sorted(grenzen or []) + [x_data[-1]]
+
+def figuur_patch(staat, grenzen, stijlen, trace_data):
+    # Enkel sturen wat veranderd is t.o.v. de getekende figuur (staat), of None
+    # als het aantal etappes verschilt en de figuur opnieuw moet
+    if not staat or len(staat["grenzen"]) != len(grenzen):
+        return None
+
+    patch = dash.Patch()
+    oude_grenzen = staat["grenzen"]
+    for i in range(len(grenzen) - 1):
+        if oude_grenzen[i:i + 2] != grenzen[i:i + 2]:
+            for key, value in trace_data(i).items():
+                patch["data"][i][key] = value
+        if staat["stijlen"][i] != stijlen[i]:
+            for key, value in stijlen[i].items():
+                patch["data"][i][key] = value
+    return patch
 
 def register_callbacks(app):
 
@@ -34,21 +81,20 @@ def register_callbacks(app):
 
     @app.callback(
         Output("hoogtegrafiek", "figure"),
+        Output("hoogtegrafiek-staat", "data"),
         Input("grens-store", "data"),
-        Input("team-store", "data")
+        Input("team-store", "data"),
+        State("hoogtegrafiek-staat", "data")
     )
-    def update_figure(grenzen, team_data):
+    def update_figure(grenzen, team_data, staat):
+        x_data, y_data, lat_data, lon_data = laad_route()
+        x_arr, x_plot, y_plot, lat_plot, lon_plot = plot_route()
         team_data = team_data or {}
-        fig = go.Figure()
+        grenzen = etappe_grenzen(grenzen)
 
-        grenzen = [0] + sorted(grenzen) + [x_data[-1]]
+        stijlen = []
         legend_shown = set()
-
         for i in range(len(grenzen) - 1):
-            start = grenzen[i]
-            end = grenzen[i + 1]
-            mask = (np.array(x_data) >= start) & (np.array(x_data) <= end)
-
             etappe_id = f"Etappe {i + 1}"
             naam = team_data.get(etappe_id)
             kleur = team_kleuren.get(naam, "black")
@@ -57,19 +103,20 @@ def register_callbacks(app):
             if showlegend:
                 legend_shown.add(naam)
 
-            fig.add_trace(go.Scatter(
-                x=np.array(x_data)[mask],
-                y=np.array(y_data)[mask],
-                mode='lines',
+            stijlen.append(dict(
                 line=dict(color=kleur, width=3),
                 name=naam if naam else "Niet toegewezen",
                 showlegend=showlegend,
                 legendgroup=naam if naam else "onbekend"
             ))
 
+        def trace_data(i):
+            mask = (x_arr >= grenzen[i]) & (x_arr <= grenzen[i + 1])
+            return dict(x=x_plot[mask].tolist(), y=y_plot[mask].tolist())
+
         shapes = []
         annotations = []
-        for gx in sorted(grenzen[1:-1]):
+        for gx in grenzen[1:-1]:
             shapes.append({
                 "type": "line",
                 "x0": gx,
@@ -90,7 +137,22 @@ def register_callbacks(app):
                 xanchor="center"
             ))
 
+        nieuwe_staat = {"grenzen": grenzen, "stijlen": stijlen}
+        patch = figuur_patch(staat, grenzen, stijlen, trace_data)
+        if patch is not None:
+            if staat == nieuwe_staat:
+                return dash.no_update, dash.no_update
+            if staat["grenzen"] != grenzen:
+                patch["layout"]["shapes"] = shapes
+                patch["layout"]["annotations"] = annotations
+            return patch, nieuwe_staat
+
+        fig = go.Figure()
+        for i in range(len(grenzen) - 1):
+            fig.add_trace(go.Scatter(mode='lines', **trace_data(i), **stijlen[i]))
+
         fig.update_layout(
+            template=MINI_TEMPLATE,
             height=600,
             xaxis_title="Afstand (km)",
             yaxis_title="Hoogte (m)",
@@ -109,7 +171,7 @@ def register_callbacks(app):
             )
         )
 
-        return fig
+        return fig, nieuwe_staat
 
 
 
@@ -122,6 +184,7 @@ def register_callbacks(app):
         Input("opmerking-store", "data")
     )
     def update_tabel(grenzen, team_data, tempo_data, opmerkingen):
+        x_data, y_data, lat_data, lon_data = laad_route()
         resultaten = calc_etappes(x_data, y_data, grenzen)
         team_data = team_data or {}
         tempo_data = tempo_data or {}
@@ -218,29 +281,45 @@ def register_callbacks(app):
 
     @app.callback(
         Output("kaart-plot", "figure"),
+        Output("kaart-staat", "data"),
         Input("grens-store", "data"),
-        Input("team-store", "data")
+        Input("team-store", "data"),
+        State("kaart-staat", "data")
     )
-    def update_kaart(grenzen, team_data):
-        df = segmenteer_route(lat_data, lon_data, grenzen, x_data)
-        fig = go.Figure()
+    def update_kaart(grenzen, team_data, staat):
+        x_data, y_data, lat_data, lon_data = laad_route()
+        x_arr, x_plot, y_plot, lat_plot, lon_plot = plot_route()
+        team_data = team_data or {}
+        grenzen = etappe_grenzen(grenzen)
+        etappes = segmenteer_route(lat_data, lon_data, grenzen[1:-1], x_data)["etappe"].to_numpy()
 
-        for etappe_id in sorted(df["etappe"].unique()):
-            etappe_data = df[df["etappe"] == etappe_id]
-            etappe_naam = f"Etappe {etappe_id}"
+        stijlen = []
+        for i in range(len(grenzen) - 1):
+            etappe_naam = f"Etappe {i + 1}"
             naam = team_data.get(etappe_naam)
             kleur = team_kleuren.get(naam, "black")
-
-            fig.add_trace(go.Scattermapbox(
-                lat=etappe_data["lat"],
-                lon=etappe_data["lon"],
-                mode="lines",
+            stijlen.append(dict(
                 line=dict(color=kleur, width=4),
-                name=etappe_naam if naam else "Niet toegewezen",
-                hoverinfo="skip"
+                name=etappe_naam if naam else "Niet toegewezen"
             ))
 
+        def trace_data(i):
+            mask = etappes == i + 1
+            return dict(lat=lat_plot[mask].tolist(), lon=lon_plot[mask].tolist())
+
+        nieuwe_staat = {"grenzen": grenzen, "stijlen": stijlen}
+        patch = figuur_patch(staat, grenzen, stijlen, trace_data)
+        if patch is not None:
+            if staat == nieuwe_staat:
+                return dash.no_update, dash.no_update
+            return patch, nieuwe_staat
+
+        fig = go.Figure()
+        for i in range(len(grenzen) - 1):
+            fig.add_trace(go.Scattermapbox(mode="lines", hoverinfo="skip", **trace_data(i), **stijlen[i]))
+
         fig.update_layout(
+            template=MINI_TEMPLATE,
             mapbox=dict(
                 style="open-street-map",
                 center=dict(lat=np.mean(lat_data), lon=np.mean(lon_data)),
@@ -250,7 +329,20 @@ def register_callbacks(app):
             showlegend=False
         )
 
-        return fig
+        return fig, nieuwe_staat
+
+    @app.callback(
+        Output("export-download", "data"),
+        Input("export-etappes", "n_clicks"),
+        State("grens-store", "data"),
+        State("team-store", "data"),
+        State("selected-file", "data"),
+        prevent_initial_call=True
+    )
+    def exporteer_etappes(n_clicks, grenzen, team_data, selected_file):
+        inhoud = exporteer_zip(grenzen or [], team_data)
+        naam = (selected_file or "etappes").removesuffix(".csv")
+        return dcc.send_bytes(inhoud, f"{naam}_export.zip")
 
     @app.callback(
         Output("team-store", "data"),
@@ -287,6 +379,7 @@ def register_callbacks(app):
         current_team, current_tempo, current_opm,
         selected_file, new_name, huidige_grenzen
     ):
+        x_data, y_data, lat_data, lon_data = laad_route()
         triggered = ctx.triggered_id
         grenzen = huidige_grenzen.copy() if huidige_grenzen else []
 
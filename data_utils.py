@@ -1,5 +1,7 @@
 import os
 import csv
+import stat
+import tempfile
 
 DATA_FOLDER = os.path.join(os.path.dirname(__file__), "data")
 
@@ -37,19 +39,31 @@ def load_data_from_csv(filename):
 
 def save_data_to_csv(resultaten, team_data, tempo_data, opmerkingen, grenzen, filename):
     path = os.path.join(DATA_FOLDER, filename)
-    with open(path, mode='w', newline='') as f:
-        writer = csv.writer(f)
-        writer.writerow(["Etappe", "Afstand", "Stijging", "Daling", "Teamlid", "Tempo", "Opmerking"])
-        for r in resultaten:
-            etappe = r['Etappe']
-            writer.writerow([
-                etappe,
-                r['Afstand (km)'],
-                r['Stijging (m)'],
-                r['Daling (m)'],
-                team_data.get(etappe, ''),
-                tempo_data.get(etappe, ''),
-                opmerkingen.get(etappe, '')
-            ])
-        writer.writerow([])
-        writer.writerow(["_GRENZEN"] + grenzen)
+    # Eerst naar een tijdelijk bestand schrijven en dan vervangen, zodat een
+    # half geschreven CSV nooit het origineel overschrijft. mkstemp geeft elke
+    # aanroep een eigen bestand, ook bij gelijktijdige saves vanuit de server.
+    fd, tmp_path = tempfile.mkstemp(dir=DATA_FOLDER, suffix=".tmp")
+    try:
+        with os.fdopen(fd, mode='w', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(["Etappe", "Afstand", "Stijging", "Daling", "Teamlid", "Tempo", "Opmerking"])
+            for r in resultaten:
+                etappe = r['Etappe']
+                writer.writerow([
+                    etappe,
+                    r['Afstand (km)'],
+                    r['Stijging (m)'],
+                    r['Daling (m)'],
+                    team_data.get(etappe, ''),
+                    tempo_data.get(etappe, ''),
+                    opmerkingen.get(etappe, '')
+                ])
+            writer.writerow([])
+            writer.writerow(["_GRENZEN"] + grenzen)
+        # mkstemp maakt het bestand enkel leesbaar voor de eigenaar; rechten behouden
+        os.chmod(tmp_path, stat.S_IMODE(os.stat(path).st_mode) if os.path.exists(path) else 0o644)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
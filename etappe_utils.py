@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+
+# Rekenwerk per etappe zonder de route zelf in te lezen, zodat worker-processen
+# dit kunnen importeren zonder parse_gpx opnieuw te draaien
+
+def segmenteer_route(lat, lon, grenspunten, afstanden):
+    df = pd.DataFrame({
+        "lat": lat,
+        "lon": lon,
+        "afstand": afstanden
+    })
+
+    df["etappe"] = 0
+    grenzen = [0] + sorted(grenspunten) + [afstanden[-1]]
+
+    for i in range(len(grenzen) - 1):
+        start = grenzen[i]
+        einde = grenzen[i + 1]
+        mask = (df["afstand"] >= start) & (df["afstand"] <= einde)
+        df.loc[mask, "etappe"] = i + 1
+
+    return df
+
+# === Etappeberekening ===
+def calc_etappes(x, y, grenspunten):
+    resultaten = []
+    grenzen = [0] + sorted(grenspunten) + [x[-1]]
+
+    for i in range(len(grenzen) - 1):
+        start = grenzen[i]
+        einde = grenzen[i + 1]
+
+        mask = (np.array(x) >= start) & (np.array(x) <= einde)
+        segment_x = np.array(x)[mask]
+        segment_y = np.array(y)[mask]
+
+        if len(segment_x) < 2:
+            continue
+
+        afstand = segment_x[-1] - segment_x[0]
+        hoogteverschillen = np.diff(segment_y)
+        stijging = np.sum(hoogteverschillen[hoogteverschillen > 0])
+        daling = -np.sum(hoogteverschillen[hoogteverschillen < 0])
+
+        resultaten.append({
+            'Etappe': f'Etappe {i + 1}',
+            'Afstand (km)': round(afstand, 2),
+            'Stijging (m)': round(stijging, 1),
+            'Daling (m)': round(daling, 1)
+        })
+
+    return resultaten
@@ -0,0 +1,228 @@
+import io
+import json
+import multiprocessing
+import os
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import gpxpy.gpx
+import numpy as np
+
+from etappe_utils import calc_etappes
+from gpx_utils import laad_route, team_kleuren
+
+
+# === Route opknippen volgens de grens-store ===
+def knip_etappes(grenspunten, team_data=None):
+    # Enkel het hoofdproces leest de volledige route in,
+    # de workers krijgen alleen de stukken per etappe mee
+    x_data, y_data, lat_data, lon_data = laad_route()
+
+    # Route als arrays, zodat het opknippen per etappe een slice is i.p.v. een mask
+    x_arr = np.asarray(x_data)
+    team_data = team_data or {}
+    # Zelfde grenzen als calc_etappes: start en einde van een etappe tellen allebei mee
+    grenzen = [0] + sorted(grenspunten) + [x_arr[-1]]
+    etappes = []
+
+    for i in range(len(grenzen) - 1):
+        begin = np.searchsorted(x_arr, grenzen[i], side="left")
+        einde = np.searchsorted(x_arr, grenzen[i + 1], side="right")
+        if einde - begin < 2:
+            continue
+
+        etappe = f"Etappe {i + 1}"
+        teamlid = team_data.get(etappe) or ""
+        etappes.append({
+            "etappe": etappe,
+            "teamlid": teamlid,
+            "kleur": team_kleuren.get(teamlid, "black"),
+            "afstanden": x_arr[begin:einde],
+            "hoogtes": np.asarray(y_data[begin:einde]),
+            "lat": np.asarray(lat_data[begin:einde]),
+            "lon": np.asarray(lon_data[begin:einde])
+        })
+
+    return etappes
+
+
+def laad_matplotlib():
+    # Pas bij de eerste export laden: zo starten de server en de workers zonder plotting-stack
+    import matplotlib
+    matplotlib.use("Agg")  # Geen scherm nodig in de worker-processen
+    import matplotlib.pyplot as plt
+    from matplotlib.backends.backend_pdf import PdfPages
+    return plt, PdfPages
+
+
+def warm_worker():
+    laad_matplotlib()
+
+
+# === Bestandsformaten per etappe ===
+def maak_gpx(etappe):
+    gpx = gpxpy.gpx.GPX()
+    track = gpxpy.gpx.GPXTrack(name=etappe["etappe"])
+    segment = gpxpy.gpx.GPXTrackSegment()
+    for lat, lon, ele in zip(etappe["lat"], etappe["lon"], etappe["hoogtes"]):
+        segment.points.append(gpxpy.gpx.GPXTrackPoint(float(lat), float(lon), elevation=float(ele)))
+    track.segments.append(segment)
+    gpx.tracks.append(track)
+    return gpx.to_xml()
+
+
+def maak_geojson(etappe, stats):
+    feature = {
+        "type": "Feature",
+        "properties": {
+            "etappe": etappe["etappe"],
+            "teamlid": etappe["teamlid"],
+            "afstand_km": float(stats["Afstand (km)"]),
+            "stijging_m": float(stats["Stijging (m)"]),
+            "daling_m": float(stats["Daling (m)"])
+        },
+        "geometry": {
+            "type": "LineString",
+            "coordinates": [
+                [round(float(lon), 6), round(float(lat), 6), round(float(ele), 1)]
+                for lat, lon, ele in zip(etappe["lat"], etappe["lon"], etappe["hoogtes"])
+            ]
+        }
+    }
+    return json.dumps({"type": "FeatureCollection", "features": [feature]})
+
+
+def maak_hoogteprofiel(etappe, stats):
+    plt, _ = laad_matplotlib()
+    kleur = etappe["kleur"]
+    fig, ax = plt.subplots(figsize=(11.69, 8.27))  # A4 liggend
+
+    ax.plot(etappe["afstanden"], etappe["hoogtes"], color=kleur, linewidth=2)
+    ax.fill_between(etappe["afstanden"], etappe["hoogtes"], min(etappe["hoogtes"]), color=kleur, alpha=0.15)
+    ax.set_xlabel("Afstand (km)")
+    ax.set_ylabel("Hoogte (m)")
+    ax.grid(True, linestyle=":", color="lightgrey")
+
+    titel = etappe["etappe"]
+    if etappe["teamlid"]:
+        titel += f" – {etappe['teamlid']}"
+    ax.set_title(titel)
+    fig.text(
+        0.5, 0.02,
+        f"Van {etappe['afstanden'][0]:.1f} tot {etappe['afstanden'][-1]:.1f} km  |  "
+        f"Afstand {stats['Afstand (km)']} km  |  "
+        f"Stijging {stats['Stijging (m)']} m  |  Daling {stats['Daling (m)']} m",
+        ha="center"
+    )
+
+    return fig
+
+
+def exporteer_groep(etappes):
+    # Draait in een worker-proces: alle bestanden van één teamlid, of van één
+    # niet-toegewezen etappe. Elk hoogteprofiel wordt één keer getekend en komt
+    # zowel in de eigen PDF als in het roadbook van het teamlid.
+    plt, PdfPages = laad_matplotlib()
+    teamlid = etappes[0]["teamlid"]
+    map_naam = teamlid or "Niet_toegewezen"
+    bestanden = {}
+    roadbook = io.BytesIO()
+
+    with PdfPages(roadbook) as roadbook_pages:
+        for etappe in etappes:
+            stats = calc_etappes(etappe["afstanden"], etappe["hoogtes"], [])[0]
+            basis = f"{map_naam}/{etappe['etappe'].replace(' ', '_')}"
+            fig = maak_hoogteprofiel(etappe, stats)
+
+            png = io.BytesIO()
+            fig.savefig(png, format="png", dpi=100)
+            pdf = io.BytesIO()
+            with PdfPages(pdf) as pages:
+                pages.savefig(fig)
+            if teamlid:
+                roadbook_pages.savefig(fig)
+            plt.close(fig)
+
+            bestanden[f"{basis}.gpx"] = maak_gpx(etappe).encode("utf-8")
+            bestanden[f"{basis}.geojson"] = maak_geojson(etappe, stats).encode("utf-8")
+            bestanden[f"{basis}_hoogteprofiel.png"] = png.getvalue()
+            bestanden[f"{basis}_roadbook.pdf"] = pdf.getvalue()
+
+    if teamlid:
+        bestanden[f"{map_naam}/roadbook.pdf"] = roadbook.getvalue()
+    return bestanden
+
+
+# === Alles samen als één zip ===
+_pool = None
+_pool_lock = threading.Lock()
+
+def start_pool():
+    # Aanroepen bij het opstarten, voordat de server threads start. Dan kan er nog
+    # veilig geforkt worden en erven de workers alles wat al geladen is, in plaats
+    # van het hoofdscript (app.py) elk opnieuw te importeren.
+    global _pool
+    if "fork" not in multiprocessing.get_all_start_methods() or (os.cpu_count() or 1) < 2:
+        return
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context("fork"))
+            # Met fork start de eerste taak meteen alle workers, dus nu en niet tijdens een request.
+            # Daarna laden de workers matplotlib op de achtergrond, zonder dat de server wacht.
+            _pool.submit(int).result()
+            for _ in range(os.cpu_count()):
+                _pool.submit(warm_worker)
+
+
+def geef_pool():
+    # Eén pool voor de hele levensduur van de server. Is die niet bij het opstarten
+    # gemaakt (of weggegooid na een crash), dan wordt hij hier gemaakt. Niet forken
+    # vanuit de multithreaded Flask-server: forkserver start de workers vanuit een
+    # apart proces met één thread (spawn waar forkserver niet bestaat).
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            methode = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+            _pool = ProcessPoolExecutor(mp_context=multiprocessing.get_context(methode))
+        return _pool
+
+
+def groepeer_per_teamlid(etappes):
+    # Eén groep per teamlid (voor het roadbook), niet-toegewezen etappes elk apart
+    groepen = {}
+    for etappe in etappes:
+        sleutel = etappe["teamlid"] or etappe["etappe"]
+        groepen.setdefault(sleutel, []).append(etappe)
+    return list(groepen.values())
+
+
+def exporteer_zip(grenspunten, team_data=None):
+    global _pool
+    groepen = groepeer_per_teamlid(knip_etappes(grenspunten, team_data))
+
+    # Met één CPU kost een pool alleen maar opstarttijd
+    if (os.cpu_count() or 1) > 1 and len(groepen) > 1:
+        pool = geef_pool()
+        try:
+            # map houdt de volgorde aan, dus de zip is altijd hetzelfde opgebouwd
+            resultaten = list(pool.map(exporteer_groep, groepen))
+        except BrokenProcessPool:
+            # Een worker is gestorven (bv. geheugen op): pool weggooien zodat de volgende
+            # export een nieuwe maakt, en deze export nog eens zonder pool doen
+            with _pool_lock:
+                if _pool is pool:
+                    _pool = None
+            pool.shutdown(wait=False)
+            resultaten = list(map(exporteer_groep, groepen))
+    else:
+        resultaten = list(map(exporteer_groep, groepen))
+
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", compression=zipfile.ZIP_DEFLATED) as zf:
+        for bestanden in resultaten:
+            for naam, inhoud in bestanden.items():
+                zf.writestr(naam, inhoud)
+
+    return buffer.getvalue()
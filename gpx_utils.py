@@ -1,8 +1,9 @@
 import os
+from functools import lru_cache
 import gpxpy
 import numpy as np
 from geopy.distance import geodesic
-import pandas as pd
+from etappe_utils import segmenteer_route, calc_etappes
 
 # === Kleuren per teamlid ===
 team_kleuren = {
@@ -44,57 +45,13 @@ def parse_gpx(gpx_path):
 
     return afstanden, hoogtes, latitudes, longitudes
 
-# Bereken de GPX-gegevens
+# Bereken de GPX-gegevens pas bij het eerste gebruik, en maar één keer per proces.
+# Zo blijft importeren goedkoop, ook voor worker-processen die de route niet nodig hebben.
 gpx_path = os.path.join(os.path.dirname(__file__), "parcours.gpx")
-x_data, y_data, lat_data, lon_data = parse_gpx(gpx_path)
 
-def segmenteer_route(lat, lon, grenspunten, afstanden):
-    df = pd.DataFrame({
-        "lat": lat,
-        "lon": lon,
-        "afstand": afstanden
-    })
-
-    df["etappe"] = 0
-    grenzen = [0] + sorted(grenspunten) + [afstanden[-1]]
-
-    for i in range(len(grenzen) - 1):
-        start = grenzen[i]
-        einde = grenzen[i + 1]
-        mask = (df["afstand"] >= start) & (df["afstand"] <= einde)
-        df.loc[mask, "etappe"] = i + 1
-
-    return df
-
-# === Etappeberekening ===
-def calc_etappes(x, y, grenspunten):
-    resultaten = []
-    grenzen = [0] + sorted(grenspunten) + [x[-1]]
-
-    for i in range(len(grenzen) - 1):
-        start = grenzen[i]
-        einde = grenzen[i + 1]
-
-        mask = (np.array(x) >= start) & (np.array(x) <= einde)
-        segment_x = np.array(x)[mask]
-        segment_y = np.array(y)[mask]
-
-        if len(segment_x) < 2:
-            continue
-
-        afstand = segment_x[-1] - segment_x[0]
-        hoogteverschillen = np.diff(segment_y)
-        stijging = np.sum(hoogteverschillen[hoogteverschillen > 0])
-        daling = -np.sum(hoogteverschillen[hoogteverschillen < 0])
-
-        resultaten.append({
-            'Etappe': f'Etappe {i + 1}',
-            'Afstand (km)': round(afstand, 2),
-            'Stijging (m)': round(stijging, 1),
-            'Daling (m)': round(daling, 1)
-        })
-
-    return resultaten
+@lru_cache(maxsize=None)
+def laad_route():
+    return parse_gpx(gpx_path)
 
 # Tempo converter
 def tempo_str_to_min(t_str):
@@ -106,6 +106,9 @@ def serve_layout():
             dcc.Store(id="team-store", data=init_team),
             dcc.Store(id="tempo-store", data=init_tempo),
             dcc.Store(id="opmerking-store", data=init_opmerking),
+            # Wat er nu getekend is, zodat de grafieken met een Patch bijgewerkt kunnen worden
+            dcc.Store(id="hoogtegrafiek-staat"),
+            dcc.Store(id="kaart-staat"),
 
             # Box met etappelijnbeheer en grafiek
             html.Div([
@@ -122,8 +125,15 @@ def serve_layout():
                     html.Button(
                         "➖ Verwijder laatste etappelijn",
                         id="remove-line",
+                        n_clicks=0,
+                        style={"marginRight": "10px"}
+                    ),
+                    html.Button(
+                        "⬇️ Exporteer etappes (GPX/GeoJSON/PDF)",
+                        id="export-etappes",
                         n_clicks=0
-                    )
+                    ),
+                    dcc.Download(id="export-download")
                 ], style={"textAlign": "center", "marginTop": "10px"}),
 
                 dcc.Graph(